@@ -1,5 +1,7 @@
 from flask import Flask, render_template, jsonify, request
 import os
+import time
+import threading
 from financial_tracker import FinancialTracker  # Import the main class we created
 
 app = Flask(__name__)
@@ -8,6 +10,100 @@ app = Flask(__name__)
 tracker = FinancialTracker(google_creds_path='google_credentials.json')
 tracker.create_financial_spreadsheet("My Financial Tracker")
 
+# Webhook syncs wait for a quiet period so bursts of notifications coalesce...
+WEBHOOK_DEBOUNCE_SECONDS = float(os.environ.get('WEBHOOK_DEBOUNCE_SECONDS', 30))
+# ...but a steady stream of notifications never holds a sync back longer than this
+WEBHOOK_MAX_WAIT_SECONDS = float(os.environ.get('WEBHOOK_MAX_WAIT_SECONDS', 300))
+# Lets unsigned sample payloads through, so only set it for local testing
+WEBHOOK_SKIP_VERIFICATION = os.environ.get('PLAID_WEBHOOK_SKIP_VERIFICATION') == '1'
+
+# Days of transactions to re-pull for each Plaid TRANSACTIONS webhook code
+WEBHOOK_DAYS_BACK = {
+    'INITIAL_UPDATE': 30,
+    'HISTORICAL_UPDATE': 730,
+    'DEFAULT_UPDATE': 14,
+    'SYNC_UPDATES_AVAILABLE': 14,
+    'TRANSACTIONS_REMOVED': 0
+}
+
+# The tracker isn't thread-safe, so only one sync touches the sheet at a time
+sync_lock = threading.Lock()
+
+class WebhookSyncScheduler:
+    """Debounce webhook notifications per item and coalesce them into single sync runs"""
+
+    def __init__(self, sync, debounce_seconds, max_wait_seconds):
+        self.sync = sync
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.lock = threading.Lock()
+        # Item ID -> coalesced work waiting for its debounce timer
+        self.queued = {}
+
+    def notify(self, item_id, days_back=0, removed_transaction_ids=()):
+        """Queue work for an item and (re)start its debounce timer"""
+        with self.lock:
+            queued = self.queued.get(item_id)
+            if queued is None:
+                queued = self.queued[item_id] = {
+                    'days_back': 0,
+                    'removed_transaction_ids': set(),
+                    'notifications': 0,
+                    'first_notified': time.monotonic(),
+                    'timer': None
+                }
+            queued['days_back'] = max(queued['days_back'], days_back)
+            queued['removed_transaction_ids'].update(removed_transaction_ids)
+            queued['notifications'] += 1
+
+            if queued['timer'] is not None:
+                queued['timer'].cancel()
+            waited = time.monotonic() - queued['first_notified']
+            delay = max(0, min(self.debounce_seconds, self.max_wait_seconds - waited))
+            queued['timer'] = threading.Timer(delay, self.flush, args=(item_id,))
+            queued['timer'].daemon = True
+            queued['timer'].start()
+
+            return {
+                'item_id': item_id,
+                'notifications': queued['notifications'],
+                'days_back': queued['days_back'],
+                'removed_transactions': len(queued['removed_transaction_ids']),
+                'sync_in_seconds': delay
+            }
+
+    def flush(self, item_id):
+        """Run one sync for everything queued for an item"""
+        with self.lock:
+            queued = self.queued.pop(item_id, None)
+            if queued is None:
+                return None
+            queued['timer'].cancel()
+
+        print(f"Syncing item {item_id} for {queued['notifications']} webhook notifications")
+        return self.sync(item_id, queued['days_back'], queued['removed_transaction_ids'])
+
+def run_webhook_sync(item_id, days_back, removed_transaction_ids):
+    """Apply coalesced webhook work to the sheet"""
+    with sync_lock:
+        try:
+            if removed_transaction_ids:
+                tracker.remove_transactions_from_sheet(removed_transaction_ids)
+            if days_back:
+                return tracker.run_update_cycle(days_back=days_back)
+            if removed_transaction_ids:
+                tracker.update_dashboard()
+            return 0
+        except Exception as e:
+            print(f"Error syncing item {item_id}: {str(e)}")
+            return None
+
+webhook_scheduler = WebhookSyncScheduler(
+    run_webhook_sync,
+    debounce_seconds=WEBHOOK_DEBOUNCE_SECONDS,
+    max_wait_seconds=WEBHOOK_MAX_WAIT_SECONDS
+)
+
 @app.route('/')
 def index():
     """Render the home page with Plaid Link"""
@@ -25,7 +121,8 @@ def get_access_token():
     # For this example, we're just storing it in memory
     
     # Run initial update to fetch transactions
-    added = tracker.run_update_cycle(days_back=90)  # Get 90 days of transactions
+    with sync_lock:
+        added = tracker.run_update_cycle(days_back=90)  # Get 90 days of transactions
     
     return jsonify({
         'success': True,
@@ -35,12 +132,56 @@ def get_access_token():
 @app.route('/update_transactions')
 def update_transactions():
     """Endpoint to update transactions"""
-    added = tracker.run_update_cycle(days_back=30)  # Get 30 days of transactions
+    with sync_lock:
+        added = tracker.run_update_cycle(days_back=30)  # Get 30 days of transactions
     return jsonify({
         'success': True,
         'transactions_added': added
     })
 
+@app.route('/plaid_webhook', methods=['POST'])
+def plaid_webhook():
+    """Receive Plaid webhooks and queue a debounced sync for the item"""
+    # Anyone can reach this URL, so only act on webhooks Plaid actually signed
+    if not WEBHOOK_SKIP_VERIFICATION and not tracker.verify_webhook(
+            request.get_data(), request.headers.get('Plaid-Verification')):
+        return jsonify({'success': False, 'queued': False, 'reason': 'Invalid signature'}), 401
+        
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'queued': False, 'reason': 'Expected a JSON object'}), 400
+    webhook_type = payload.get('webhook_type')
+    webhook_code = payload.get('webhook_code')
+    item_id = payload.get('item_id')
+
+    # Plaid only needs a 200 back, so ignored notifications still succeed
+    if webhook_type != 'TRANSACTIONS' or webhook_code not in WEBHOOK_DAYS_BACK:
+        return jsonify({'success': True, 'queued': False, 'reason': 'Unhandled webhook'})
+    if not isinstance(item_id, str) or not item_id:
+        return jsonify({'success': False, 'queued': False, 'reason': 'Missing item_id'}), 400
+    # Only the linked item can trigger a sync, and nothing can before an item is linked
+    if tracker.access_token is None or tracker.item_id is None:
+        return jsonify({'success': False, 'queued': False, 'reason': 'No linked item'}), 409
+    if item_id != tracker.item_id:
+        return jsonify({'success': False, 'queued': False, 'reason': 'Unknown item'}), 404
+
+    days_back = WEBHOOK_DAYS_BACK[webhook_code]
+    # A DEFAULT_UPDATE with nothing new doesn't need an API call
+    if webhook_code == 'DEFAULT_UPDATE' and not payload.get('new_transactions'):
+        days_back = 0
+    removed_transaction_ids = payload.get('removed_transactions')
+    if removed_transaction_ids is None:
+        removed_transaction_ids = []
+    if not isinstance(removed_transaction_ids, list) or not all(
+            isinstance(transaction_id, str) and transaction_id for transaction_id in removed_transaction_ids):
+        return jsonify({'success': False, 'queued': False, 'reason': 'removed_transactions must be a list of transaction IDs'}), 400
+
+    if not days_back and not removed_transaction_ids:
+        return jsonify({'success': True, 'queued': False, 'reason': 'No new data'})
+
+    queued = webhook_scheduler.notify(item_id, days_back, removed_transaction_ids)
+    return jsonify({'success': True, 'queued': True, **queued})
+
 if __name__ == '__main__':
     # Set environment variables for Plaid
     os.environ['PLAID_CLIENT_ID'] = 'your_plaid_client_id'
@@ -1,4 +1,8 @@
 import os
+import re
+import bisect
+import hmac
+import hashlib
 import datetime
 import plaid
 import json
@@ -9,17 +13,258 @@ from plaid.model.transactions_get_request_options import TransactionsGetRequestO
 from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
 from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
+from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
 from plaid.configuration import Configuration, ApiClient
 import gspread
+import jwt
+from jwt.algorithms import ECAlgorithm
 from google.oauth2.service_account import Credentials
 from datetime import datetime, timedelta
 import pandas as pd
 import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
+from collections import OrderedDict
+
+TRANSACTION_HEADERS = [
+    "Date", "Description", "Amount", "Category", 
+    "Account", "Transaction ID", "Pending", "Merchant Name"
+]
+SHARD_MANIFEST_HEADERS = ["Shard", "Start Date", "End Date", "Status", "Summary Rows"]
+SHARD_SUMMARY_HEADERS = ["Month", "Category", "Spending", "Income", "Transactions"]
+
+# How far before a posted transaction its pending row may be dated
+PENDING_LOOKBACK_DAYS = 14
+
+# Plaid webhooks signed longer ago than this are treated as replays
+WEBHOOK_MAX_AGE_SECONDS = 5 * 60
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD string, passing date objects through"""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+def first_appended_row(response):
+    """Return the first row number written by an append, or None if unknown"""
+    # The API reports where the rows landed, e.g. "'Transactions 2024'!A42:H57"
+    updated_range = response.get('updates', {}).get('updatedRange', '') if response else ''
+    match = re.search(r'![A-Z]+(\d+)', updated_range)
+    return int(match.group(1)) if match else None
+
+# Known merchants, checked in order: (pattern, canonical name)
+MERCHANT_ALIASES = [
+    (r'\b(?:AMZN|AMAZON)\b', 'Amazon'),
+    (r'\bUBER\s*\*?\s*EATS\b', 'Uber Eats'),
+    (r'\bUBER\b', 'Uber'),
+    (r'\bLYFT\b', 'Lyft'),
+    (r'\bNETFLIX\b', 'Netflix'),
+    (r'\bSPOTIFY\b', 'Spotify'),
+    (r'\bWAL-?MART\b|\bWM SUPERCENTER\b', 'Walmart'),
+    (r'\bTARGET\b', 'Target'),
+    (r'\bSTARBUCKS\b', 'Starbucks'),
+    (r'\bWHOLEFDS\b|\bWHOLE FOODS\b', 'Whole Foods')
+]
+# Cleanup applied in order to anything that isn't a known merchant
+MERCHANT_CLEANUP = [
+    (r'^(?:SQ|TST|SP|PAYPAL|PY)\s*\*\s*', ''),  # Payment processor prefixes, e.g. "SQ *"
+    (r'\*.*$', ''),                               # Reference codes after "*"
+    (r'#\s*\d+', ''),                             # Store numbers
+    (r'(?<=\S)\s+\d[\d/.-]*(?!\S)', ''),          # Numbers and dates after the name
+    (r'\s+', ' ')
+]
+
+def summary_title(shard_title):
+    """Return the title of the worksheet holding a shard's pre-rolled summary"""
+    return f"{shard_title} Summary"
+
+def read_shard_manifest(worksheet):
+    """Read the Shards worksheet into a shard title -> details dict"""
+    shards = {}
+    manifest = worksheet.get_all_values()[1:]  # Skip header
+    for row_number, row in enumerate(manifest, start=2):
+        if len(row) < 4 or not row[0]:
+            continue
+        summary_rows = row[4] if len(row) > 4 else ''
+        shards[row[0]] = {
+            'start': parse_date(row[1]),
+            'end': parse_date(row[2]),
+            'status': row[3],
+            'manifest_row': row_number,
+            'summary_rows': int(summary_rows) if str(summary_rows).strip() else None
+        }
+    return shards
+
+def transactions_frame(rows):
+    """Convert Transactions worksheet rows to a DataFrame with typed Date, Amount and Month"""
+    df = pd.DataFrame(
+        [row[:len(TRANSACTION_HEADERS)] for row in rows],
+        columns=TRANSACTION_HEADERS
+    )
+    df['Amount'] = df['Amount'].astype(float)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['Month'] = df['Date'].dt.strftime('%Y-%m')
+    return df
+
+def summarize_transactions(df):
+    """Total spending (outflows, as positive amounts) and income per month and category"""
+    return df.assign(
+        Spending=(-df['Amount']).clip(lower=0),
+        Income=df['Amount'].clip(lower=0)
+    ).groupby(['Month', 'Category']).agg(
+        Spending=('Spending', 'sum'),
+        Income=('Income', 'sum'),
+        Transactions=('Amount', 'count')
+    ).reset_index()
+
+def summary_frame(rows):
+    """Convert shard summary worksheet rows to a DataFrame"""
+    df = pd.DataFrame(
+        [row[:len(SHARD_SUMMARY_HEADERS)] for row in rows if len(row) >= len(SHARD_SUMMARY_HEADERS) and row[0]],
+        columns=SHARD_SUMMARY_HEADERS
+    )
+    df[['Spending', 'Income']] = df[['Spending', 'Income']].astype(float)
+    df['Transactions'] = df['Transactions'].astype(int)
+    return df
+
+def read_spending_summary(shards, read_shard_rows, read_summary_rows, start_date=None, end_date=None):
+    """Get monthly per-category spending and income for a date range
+    
+    Only shards overlapping the range are read. Archived shards that lie
+    entirely inside it come from their pre-rolled summaries; the rest are
+    read row by row and filtered to the range. read_shard_rows and
+    read_summary_rows take a shard title and return its worksheet rows
+    without the header.
+    """
+    start_date = parse_date(start_date) if start_date else datetime.min.date()
+    end_date = parse_date(end_date) if end_date else datetime.max.date()
+    
+    frames = []
+    for title, shard in shards.items():
+        if shard['start'] > end_date or shard['end'] < start_date:
+            continue
+        if shard['status'] == 'archived' and start_date <= shard['start'] and shard['end'] <= end_date:
+            frames.append(summary_frame(read_summary_rows(title)))
+            continue
+            
+        rows = read_shard_rows(title)
+        if not rows:
+            continue
+        df = transactions_frame(rows)
+        df = df[(df['Date'].dt.date >= start_date) & (df['Date'].dt.date <= end_date)]
+        frames.append(summarize_transactions(df))
+        
+    if not frames:
+        return pd.DataFrame(columns=SHARD_SUMMARY_HEADERS)
+    return pd.concat(frames, ignore_index=True)
+
+def row_contribution(row):
+    """Return the (month, category) key and (spending, income) of one Transactions row"""
+    amount = float(row[2])
+    month = parse_date(str(row[0])[:10]).strftime('%Y-%m')
+    return (month, row[3]), (max(-amount, 0.0), max(amount, 0.0))
+
+class MerchantNormalizer:
+    """Canonicalize noisy merchant strings, memoized in a bounded LRU cache"""
+    
+    def __init__(self, cache_path=None, max_size=2048):
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+        self.aliases = [(re.compile(pattern, re.IGNORECASE), name) for pattern, name in MERCHANT_ALIASES]
+        self.cleanup = [(re.compile(pattern, re.IGNORECASE), repl) for pattern, repl in MERCHANT_CLEANUP]
+        # Cached names are only valid for the rules that produced them
+        self.rules_version = hashlib.sha1(
+            json.dumps([MERCHANT_ALIASES, MERCHANT_CLEANUP]).encode()
+        ).hexdigest()
+        
+        if cache_path:
+            self.load()
+            
+    def normalize(self, raw_name):
+        """Return the canonical merchant name for a raw string"""
+        if not raw_name:
+            return ""
+            
+        normalized = self.cache.get(raw_name)
+        if normalized is not None:
+            self.cache.move_to_end(raw_name)
+            self.hits += 1
+            return normalized
+            
+        self.misses += 1
+        normalized = self.apply_rules(raw_name)
+        self.cache[raw_name] = normalized
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return normalized
+    
+    def apply_rules(self, raw_name):
+        """Run the alias and cleanup rules on a raw merchant string"""
+        for pattern, name in self.aliases:
+            if pattern.search(raw_name):
+                return name
+                
+        cleaned = raw_name
+        for pattern, repl in self.cleanup:
+            cleaned = pattern.sub(repl, cleaned)
+        cleaned = cleaned.strip(" -*#")
+        if not cleaned:
+            return raw_name.strip()
+        return " ".join(word.capitalize() for word in cleaned.split())
+    
+    def reset_stats(self):
+        """Start counting hits and misses afresh, e.g. for the next update cycle"""
+        self.hits = 0
+        self.misses = 0
+        
+    def stats(self):
+        """Return cache hits, misses, hit rate and size"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.cache)
+        }
+    
+    def load(self):
+        """Load cached names saved by a previous run"""
+        try:
+            with open(self.cache_path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+            
+        if not isinstance(saved, dict):
+            return
+        if saved.get('rules_version') != self.rules_version:
+            print("Merchant rules changed, starting with an empty merchant cache")
+            return
+        try:
+            for raw_name, normalized in saved.get('entries', [])[-self.max_size:]:
+                self.cache[raw_name] = normalized
+        except (TypeError, ValueError):
+            # Entries that aren't [raw, normalized] pairs mean the file is unusable
+            self.cache.clear()
+            
+    def save(self):
+        """Save cached names, least recently used first"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            with open(self.cache_path, 'w') as f:
+                json.dump({
+                    'rules_version': self.rules_version,
+                    'entries': list(self.cache.items())
+                }, f)
+        except Exception as e:
+            print(f"Error saving merchant cache: {str(e)}")
 
 class FinancialTracker:
-    def __init__(self, google_creds_path='google_credentials.json'):
+    def __init__(self, google_creds_path='google_credentials.json', shard_by='year'):
         # Initialize Plaid client
         self.plaid_client_id = os.environ.get('PLAID_CLIENT_ID')
         self.plaid_secret = os.environ.get('PLAID_SECRET')
@@ -55,8 +300,35 @@ class FinancialTracker:
             'Other': []
         }
         
-        # Access token storage
+        # Merchant name normalization ahead of categorization, cached across runs
+        self.merchant_normalizer = MerchantNormalizer(cache_path='config/merchant_cache.json')
+        
+        # Plaid's webhook signing keys by key ID, fetched as webhooks arrive
+        self.webhook_keys = {}
+        
+        # Access token storage, restored from a previous link if there is one
         self.access_token = None
+        self.item_id = None
+        self.load_access_token()
+        
+        # Transaction history is split into per-year or per-quarter worksheets
+        if shard_by not in ('year', 'quarter'):
+            raise ValueError("shard_by must be 'year' or 'quarter'")
+        self.shard_by = shard_by
+        # Shard title -> {'start', 'end', 'status', 'manifest_row'}, from the Shards worksheet
+        self.shards = {}
+        self.shard_worksheets = {}
+        self.summary_worksheets = {}
+        # Shard title -> {(month, category): [spending, income, count]} for archived shards
+        self.shard_summaries = {}
+        
+        # Transaction ID -> (shard title, row number), rebuilt per shard at the start of each sync
+        self.row_index = {}
+        self.indexed_shards = set()
+        # Transaction ID -> row contents as last read from or written to the sheet
+        self.row_values = {}
+        # Transaction IDs whose sheet row is still marked as pending
+        self.pending_ids = set()
         
     def initialize_google_sheets(self, creds_path):
         """Initialize Google Sheets API connection"""
@@ -76,23 +348,19 @@ class FinancialTracker:
             self.sheet = self.gc.create(sheet_name)
             print(f"Created new sheet: {sheet_name}")
             
-        # Check for and create necessary worksheets
-        try:
-            self.transactions_worksheet = self.sheet.worksheet("Transactions")
-            print("Using existing Transactions worksheet")
-        except gspread.exceptions.WorksheetNotFound:
-            self.transactions_worksheet = self.sheet.add_worksheet(
-                title="Transactions", 
-                rows=1000, 
-                cols=10
-            )
-            # Add headers to transactions sheet
-            headers = [
-                "Date", "Description", "Amount", "Category", 
-                "Account", "Transaction ID", "Pending", "Merchant Name"
-            ]
-            self.transactions_worksheet.append_row(headers)
-            print("Created Transactions worksheet")
+        # Check for and create the shard manifest
+        self.shards_worksheet, _ = self.get_or_create_worksheet("Shards", SHARD_MANIFEST_HEADERS, rows=100)
+        self.load_shard_manifest()
+        
+        # Adopt a pre-sharding Transactions worksheet as an archived shard
+        if "Transactions" not in self.shards:
+            try:
+                self.register_legacy_shard(self.sheet.worksheet("Transactions"))
+            except gspread.exceptions.WorksheetNotFound:
+                pass
+                
+        # Archive finished shards and open the current one
+        self.roll_over_shards()
             
         # Create categories worksheet
         try:
@@ -122,40 +390,326 @@ class FinancialTracker:
             )
             print("Created Dashboard worksheet")
             
+    def get_or_create_worksheet(self, title, headers, rows=1000):
+        """Open a worksheet by title, creating it with a header row if missing
+        
+        Returns a (worksheet, created) tuple.
+        """
+        try:
+            worksheet = self.sheet.worksheet(title)
+            print(f"Using existing {title} worksheet")
+            return worksheet, False
+        except gspread.exceptions.WorksheetNotFound:
+            worksheet = self.sheet.add_worksheet(title=title, rows=rows, cols=len(headers))
+            worksheet.append_row(headers)
+            print(f"Created {title} worksheet")
+            return worksheet, True
+    
+    def shard_period(self, date):
+        """Return the (title, start, end) of the shard period containing a date"""
+        date = parse_date(date)
+        if self.shard_by == 'quarter':
+            quarter = (date.month - 1) // 3
+            start = date.replace(month=quarter * 3 + 1, day=1)
+            title = f"Transactions {date.year}-Q{quarter + 1}"
+            months = 3
+        else:
+            start = date.replace(month=1, day=1)
+            title = f"Transactions {date.year}"
+            months = 12
+            
+        # The period ends the day before the next one starts
+        next_month = start.month - 1 + months
+        next_start = start.replace(year=start.year + next_month // 12, month=next_month % 12 + 1)
+        return title, start, next_start - timedelta(days=1)
+    
+    def load_shard_manifest(self):
+        """Load the shard manifest from the Shards worksheet"""
+        self.shards = read_shard_manifest(self.shards_worksheet)
+        return self.shards
+    
+    def register_shard(self, title, start, end, status='active'):
+        """Add a shard to the manifest"""
+        response = self.shards_worksheet.append_row([title, start.isoformat(), end.isoformat(), status, ''])
+        manifest_row = first_appended_row(response)
+        if manifest_row is None:
+            self.load_shard_manifest()
+        else:
+            self.shards[title] = {
+                'start': start,
+                'end': end,
+                'status': status,
+                'manifest_row': manifest_row,
+                'summary_rows': None
+            }
+        print(f"Registered {status} shard: {title}")
+    
+    def register_legacy_shard(self, worksheet):
+        """Register a pre-sharding Transactions worksheet as an archived shard"""
+        rows = worksheet.get_all_values()[1:]  # Skip header
+        if not rows:
+            return
+        dates = transactions_frame(rows)['Date']
+        self.shard_worksheets[worksheet.title] = worksheet
+        self.register_shard(worksheet.title, dates.min().date(), dates.max().date(), status='archived')
+        self.roll_up_shard(worksheet.title, rows)
+    
+    def ensure_shard(self, date):
+        """Return the title of the shard for a date, creating the shard if needed"""
+        title, start, end = self.shard_period(date)
+        if title not in self.shards:
+            worksheet, created = self.get_or_create_worksheet(title, TRANSACTION_HEADERS)
+            self.shard_worksheets[title] = worksheet
+            # Late transactions can open a shard for a period that has already ended
+            status = 'archived' if end < datetime.now().date() else 'active'
+            self.register_shard(title, start, end, status=status)
+            if created:
+                # A brand new shard has nothing to index or summarize yet
+                self.indexed_shards.add(title)
+                if status == 'archived':
+                    self.shard_summaries[title] = {}
+        return title
+    
+    def get_shard_worksheet(self, title):
+        """Open (and cache) a shard worksheet"""
+        if title not in self.shard_worksheets:
+            self.shard_worksheets[title], _ = self.get_or_create_worksheet(title, TRANSACTION_HEADERS)
+        return self.shard_worksheets[title]
+    
+    def get_summary_worksheet(self, title):
+        """Open (and cache) the summary worksheet of a shard, returning (worksheet, created)"""
+        if title in self.summary_worksheets:
+            return self.summary_worksheets[title], False
+        worksheet, created = self.get_or_create_worksheet(summary_title(title), SHARD_SUMMARY_HEADERS, rows=100)
+        self.summary_worksheets[title] = worksheet
+        return worksheet, created
+    
+    def shards_overlapping(self, start_date, end_date):
+        """Return the titles of shards whose period overlaps a date range"""
+        return [
+            title for title, shard in self.shards.items()
+            if shard['start'] <= end_date and shard['end'] >= start_date
+        ]
+    
+    def roll_over_shards(self):
+        """Archive shards whose period has ended and point writes at the current shard"""
+        today = datetime.now().date()
+        for title, shard in self.shards.items():
+            if shard['status'] == 'active' and shard['end'] < today:
+                self.archive_shard(title)
+                
+        self.transactions_worksheet = self.get_shard_worksheet(self.ensure_shard(today))
+        return self.transactions_worksheet
+    
+    def archive_shard(self, title):
+        """Roll up a shard's summary and mark it archived in the manifest"""
+        self.roll_up_shard(title)
+        shard = self.shards[title]
+        self.shards_worksheet.update(f"D{shard['manifest_row']}", [['archived']])
+        shard['status'] = 'archived'
+        print(f"Archived shard: {title}")
+    
+    def roll_up_shard(self, title, rows=None):
+        """Recompute a shard's summary from all of its rows"""
+        if rows is None:
+            rows = self.get_shard_worksheet(title).get_all_values()[1:]  # Skip header
+            
+        summary = {}
+        if rows:
+            for _, row in summarize_transactions(transactions_frame(rows)).iterrows():
+                summary[(row['Month'], row['Category'])] = [
+                    float(row['Spending']), float(row['Income']), int(row['Transactions'])
+                ]
+        self.shard_summaries[title] = summary
+        self.write_shard_summary(title)
+    
+    def load_shard_summary(self, title):
+        """Load a shard's summary into memory, returning False if it had to be rolled up instead"""
+        if title in self.shard_summaries:
+            return True
+            
+        worksheet, created = self.get_summary_worksheet(title)
+        shard = self.shards.get(title)
+        if created or (shard and shard['summary_rows'] is None):
+            # The summary was never written, was lost, or its Summary Rows cell
+            # was cleared to ask for a rebuild, so roll it up from the shard
+            self.roll_up_shard(title)
+            return False
+            
+        self.shard_summaries[title] = {
+            (row['Month'], row['Category']): [float(row['Spending']), float(row['Income']), int(row['Transactions'])]
+            for _, row in summary_frame(worksheet.get_all_values()[1:]).iterrows()
+        }
+        return True
+    
+    def adjust_shard_summary(self, title, removed_rows=(), added_rows=()):
+        """Apply removed and added Transactions rows to a shard's summary without re-reading it"""
+        if not self.load_shard_summary(title):
+            # A fresh roll-up already reflects the changes
+            return
+            
+        summary = {key: list(totals) for key, totals in self.shard_summaries[title].items()}
+        drifted = False
+        for rows, sign in ((removed_rows, -1), (added_rows, 1)):
+            for row in rows:
+                try:
+                    key, (spending, income) = row_contribution(row)
+                except (TypeError, ValueError):
+                    continue
+                if sign < 0 and key not in summary:
+                    drifted = True
+                totals = summary.setdefault(key, [0.0, 0.0, 0])
+                totals[0] += sign * spending
+                totals[1] += sign * income
+                totals[2] += sign
+                
+        # A removal the summary can't account for means it no longer matches the
+        # shard (e.g. a Category was edited by hand), so rebuild it from the rows
+        if drifted or any(count < 0 or spending < -0.005 or income < -0.005
+                          for spending, income, count in summary.values()):
+            print(f"Summary of {title} drifted from its rows, rebuilding it")
+            self.roll_up_shard(title)
+            return
+            
+        self.shard_summaries[title] = summary
+        self.write_shard_summary(title)
+    
+    def rebuild_shard_summaries(self, titles=None):
+        """Recompute archived shard summaries from their rows (all archived shards by default)"""
+        if titles is None:
+            titles = [title for title, shard in self.shards.items() if shard['status'] == 'archived']
+        for title in titles:
+            self.roll_up_shard(title)
+            print(f"Rebuilt summary of {title}")
+        return titles
+    
+    def shard_summary_rows(self, title):
+        """Return a shard's summary as worksheet rows, loading it once per process"""
+        self.load_shard_summary(title)
+        return [
+            [month, category, round(spending, 2), round(income, 2), count]
+            for (month, category), (spending, income, count) in sorted(self.shard_summaries[title].items())
+            if count > 0
+        ]
+    
+    def write_shard_summary(self, title):
+        """Write a shard's in-memory summary to its own summary worksheet"""
+        worksheet, _ = self.get_summary_worksheet(title)
+        summary_rows = self.shard_summary_rows(title)
+        
+        # Write the new rows first, then clear only what's left of a longer previous summary
+        if summary_rows:
+            worksheet.update('A2', summary_rows)
+        shard = self.shards.get(title)
+        previous_rows = shard['summary_rows'] if shard and shard['summary_rows'] is not None else None
+        if previous_rows is None:
+            previous_rows = len(worksheet.col_values(1)) - 1  # Skip header
+        if previous_rows > len(summary_rows):
+            worksheet.batch_clear([f'A{len(summary_rows) + 2}:E{previous_rows + 1}'])
+            
+        if shard and shard['summary_rows'] != len(summary_rows):
+            self.shards_worksheet.update(f"E{shard['manifest_row']}", [[len(summary_rows)]])
+            shard['summary_rows'] = len(summary_rows)
+    
     def get_link_token(self):
         """Create a link token for Plaid Link"""
         user = LinkTokenCreateRequestUser(
             client_user_id='user_good'
         )
         
+        options = {}
+        # Have Plaid notify us of new transactions instead of polling
+        webhook_url = os.environ.get('PLAID_WEBHOOK_URL')
+        if webhook_url:
+            options['webhook'] = webhook_url
+            
         request = LinkTokenCreateRequest(
             user=user,
             client_name="Financial Tracker App",
             products=["transactions"],
             country_codes=["US"],
-            language="en"
+            language="en",
+            **options
         )
         
         response = self.plaid_client.link_token_create(request)
         return response.link_token
     
+    def get_webhook_key(self, key_id):
+        """Fetch (and cache) the Plaid public key a webhook was signed with"""
+        if key_id not in self.webhook_keys:
+            request = WebhookVerificationKeyGetRequest(key_id=key_id)
+            response = self.plaid_client.webhook_verification_key_get(request)
+            self.webhook_keys[key_id] = response.key.to_dict()
+        return self.webhook_keys[key_id]
+    
+    def verify_webhook(self, body, signed_jwt):
+        """Check a webhook's Plaid-Verification JWT and that it was issued for this exact body"""
+        if not signed_jwt:
+            return False
+        try:
+            header = jwt.get_unverified_header(signed_jwt)
+        except jwt.InvalidTokenError:
+            return False
+        if header.get('alg') != 'ES256' or not header.get('kid'):
+            return False
+            
+        try:
+            key = self.get_webhook_key(header['kid'])
+        except plaid.ApiException as e:
+            print(f"Error fetching webhook verification key: {str(e)}")
+            return False
+        # Rotated keys carry an expiry and shouldn't be trusted any more
+        if key.get('expired_at'):
+            return False
+            
+        public_key = ECAlgorithm.from_jwk(json.dumps({
+            'kty': key['kty'], 'crv': key['crv'], 'x': key['x'], 'y': key['y']
+        }))
+        try:
+            claims = jwt.decode(signed_jwt, public_key, algorithms=['ES256'])
+        except jwt.InvalidTokenError:
+            return False
+            
+        issued_at = claims.get('iat')
+        if not isinstance(issued_at, (int, float)) or datetime.now().timestamp() - issued_at > WEBHOOK_MAX_AGE_SECONDS:
+            return False
+        body_hash = hashlib.sha256(body).hexdigest()
+        return hmac.compare_digest(body_hash, str(claims.get('request_body_sha256', '')))
+    
     def exchange_public_token(self, public_token):
         """Exchange a public token for an access token"""
         request = ItemPublicTokenExchangeRequest(public_token=public_token)
         response = self.plaid_client.item_public_token_exchange(request)
         self.access_token = response.access_token
+        self.item_id = response.item_id
         
         # Save the access token
         try:
             os.makedirs('config', exist_ok=True)
             with open('config/access_token.json', 'w') as f:
-                json.dump({'access_token': self.access_token}, f)
+                json.dump({'access_token': self.access_token, 'item_id': self.item_id}, f)
             print("Access token saved successfully")
         except Exception as e:
             print(f"Error saving access token: {str(e)}")
             
         return self.access_token
     
+    def load_access_token(self):
+        """Load the access token and item ID saved by exchange_public_token"""
+        try:
+            with open('config/access_token.json', 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+            
+        if not isinstance(saved, dict) or not saved.get('access_token'):
+            return False
+        self.access_token = saved['access_token']
+        self.item_id = saved.get('item_id')
+        print("Access token loaded successfully")
+        return True
+    
     def get_accounts(self):
         """Get accounts for an Item"""
         request = AccountsGetRequest(access_token=self.access_token)
@@ -200,89 +754,384 @@ class FinancialTracker:
             
         return transactions
     
-    def categorize_transaction(self, transaction):
-        """Categorize a transaction based on its description"""
-        description = transaction.name.lower()
-        merchant_name = transaction.merchant_name.lower() if transaction.merchant_name else ""
-        
-        # Get categories and keywords from Google Sheet
+    def load_category_keywords(self):
+        """Get (category, keywords) pairs from the Categories worksheet"""
+        category_keywords = []
         category_data = self.categories_worksheet.get_all_values()[1:]  # Skip header
         for row in category_data:
             if len(row) < 2:
                 continue
-                
-            category = row[0]
-            keywords = [k.strip().lower() for k in row[1].split(',')]
-            
-            # Check if any keyword is in the description or merchant name
-            for keyword in keywords:
-                if keyword and (keyword in description or keyword in merchant_name):
-                    return category
-                    
+            keywords = [k.strip().lower() for k in row[1].split(',') if k.strip()]
+            category_keywords.append((row[0], keywords))
+        return category_keywords
+    
+    def categorize_transaction(self, transaction, category_keywords=None):
+        """Categorize a transaction based on its description and merchant name
+        
+        Normalized merchant names are matched first, then the raw strings, so
+        keywords that only appear in the raw text still match.
+        """
+        if category_keywords is None:
+            category_keywords = self.load_category_keywords()
+            
+        normalized = (
+            self.merchant_normalizer.normalize(transaction.name).lower(),
+            self.merchant_normalizer.normalize(transaction.merchant_name).lower()
+        )
+        raw = (
+            transaction.name.lower(),
+            transaction.merchant_name.lower() if transaction.merchant_name else ""
+        )
+        
+        # Check if any keyword is in the description or merchant name
+        for description, merchant_name in (normalized, raw):
+            for category, keywords in category_keywords:
+                for keyword in keywords:
+                    if keyword in description or keyword in merchant_name:
+                        return category
+                        
         # Default category
         return "Other"
     
-    def add_transactions_to_sheet(self, transactions):
-        """Add new transactions to Google Sheets"""
-        # Get existing transaction IDs to avoid duplicates
+    def format_transaction_row(self, transaction, category):
+        """Format a transaction as a Transactions worksheet row"""
+        return [
+            str(transaction.date),
+            transaction.name,
+            transaction.amount,
+            category,
+            transaction.account_id,
+            transaction.transaction_id,
+            "Yes" if transaction.pending else "No",
+            transaction.merchant_name if transaction.merchant_name else "Unknown"
+        ]
+    
+    def load_row_index(self, title):
+        """Add a shard's transaction ID -> row number entries to the row index"""
+        # Read the shard's rows unformatted in a single request so they can be diffed
         try:
-            existing_transaction_ids = self.transactions_worksheet.col_values(6)[1:]  # Skip header
-        except:
-            existing_transaction_ids = []
-            
-        # Format and add each transaction
-        new_rows = 0
-        for transaction in transactions:
-            if transaction.transaction_id in existing_transaction_ids:
+            rows = self.get_shard_worksheet(title).get('A:H', value_render_option='UNFORMATTED_VALUE')[1:]  # Skip header
+        except Exception:
+            rows = []
+            
+        for transaction_id, location in list(self.row_index.items()):
+            if location[0] == title:
+                del self.row_index[transaction_id]
+                self.row_values.pop(transaction_id, None)
+                
+        for row_number, values in enumerate(rows, start=2):
+            values = list(values) + [''] * (len(TRANSACTION_HEADERS) - len(values))
+            transaction_id = values[5]
+            if not transaction_id:
                 continue
+            self.row_index[transaction_id] = (title, row_number)
+            self.row_values[transaction_id] = values
+            if values[6] == "Yes":
+                self.pending_ids.add(transaction_id)
                 
-            category = self.categorize_transaction(transaction)
-            
-            # Format transaction row
-            row = [
-                transaction.date,
-                transaction.name,
-                transaction.amount,
-                category,
-                transaction.account_id,
-                transaction.transaction_id,
-                "Yes" if transaction.pending else "No",
-                transaction.merchant_name if transaction.merchant_name else "Unknown"
-            ]
-            
-            self.transactions_worksheet.append_row(row)
-            new_rows += 1
-            
-        print(f"Added {new_rows} new transactions to the sheet")
-        return new_rows
-    
-    def update_dashboard(self):
-        """Update the dashboard with spending charts and summaries"""
-        # Get all transactions
-        transactions_data = self.transactions_worksheet.get_all_values()[1:]  # Skip header
+        self.indexed_shards.add(title)
+        return self.row_index
+    
+    def reset_row_index(self):
+        """Forget the row index so the next sync reads row positions afresh
         
-        if not transactions_data:
-            print("No transactions to analyze")
+        Rows can be sorted, inserted or deleted by hand between syncs, so row
+        numbers are only trusted within the sync that read them.
+        """
+        self.row_index = {}
+        self.row_values = {}
+        self.pending_ids = set()
+        self.indexed_shards = set()
+    
+    def index_shards(self, start_date, end_date):
+        """Make sure every shard overlapping a date range is in the row index"""
+        for title in self.shards_overlapping(start_date, end_date):
+            if title not in self.indexed_shards:
+                self.load_row_index(title)
+    
+    def row_changed(self, row, existing):
+        """Check whether a formatted row differs from the sheet, ignoring Category"""
+        if existing is None:
+            return True
+        for column, (new, old) in enumerate(zip(row, existing)):
+            if column == 3:
+                # Categories can be edited by hand, so they don't count as a change
+                continue
+            if column == 2:
+                try:
+                    if float(new) != float(old):
+                        return True
+                except (TypeError, ValueError):
+                    return True
+            elif str(new) != str(old):
+                return True
+        return False
+    
+    def write_transactions(self, transactions, refresh_index=True):
+        """Upsert transactions using the row index and batched range updates
+        
+        New transactions are appended to the shard for their date, posted
+        transactions replace the row of the pending transaction they settle,
+        and rows whose data changed are rewritten in place, keeping their
+        Category. Pass refresh_index=False only when the caller has just
+        rebuilt the index itself. Returns a (added, updated) tuple of row counts.
+        """
+        transactions = list(transactions)
+        if not transactions:
+            return 0, 0
+        if refresh_index:
+            self.reset_row_index()
+            
+        # Open the shards the batch writes to, then index every shard a
+        # transaction or the pending row it settles could be in
+        dates = [parse_date(transaction.date) for transaction in transactions]
+        for date in dates:
+            self.ensure_shard(date)
+        self.index_shards(min(dates) - timedelta(days=PENDING_LOOKBACK_DAYS), max(dates))
+        
+        # Read the category keywords once for the whole batch
+        category_keywords = self.load_category_keywords()
+        
+        updates = {}
+        appends = {}
+        appended_ids = set()
+        moved_rows = []
+        # Shard title -> (removed rows, added rows) for archived shard summaries
+        summary_changes = {}
+        for transaction, date in zip(transactions, dates):
+            transaction_id = transaction.transaction_id
+            pending_transaction_id = getattr(transaction, 'pending_transaction_id', None)
+            
+            if transaction_id in self.row_index:
+                # Rows are only rewritten when Plaid has modified them or they posted
+                if not self.row_changed(self.format_transaction_row(transaction, None),
+                                        self.row_values.get(transaction_id)):
+                    continue
+                location = self.row_index.pop(transaction_id)
+                old_row = self.row_values.get(transaction_id)
+            elif pending_transaction_id and pending_transaction_id in self.row_index:
+                # Posted transaction settles its pending row, so take the row over
+                location = self.row_index.pop(pending_transaction_id)
+                old_row = self.row_values.pop(pending_transaction_id, None)
+                self.pending_ids.discard(pending_transaction_id)
+            elif transaction_id in appended_ids:
+                continue
+            else:
+                location = None
+                old_row = None
+                
+            # Rows already in the sheet keep their (possibly hand-edited) Category
+            if old_row is not None and old_row[3]:
+                category = old_row[3]
+            else:
+                category = self.categorize_transaction(transaction, category_keywords)
+            row = self.format_transaction_row(transaction, category)
+            self.row_values[transaction_id] = row
+            if transaction.pending:
+                self.pending_ids.add(transaction_id)
+            else:
+                self.pending_ids.discard(transaction_id)
+                
+            if location is not None:
+                title, row_number = location
+                shard = self.shards[title]
+                if shard['start'] <= date <= shard['end']:
+                    self.row_index[transaction_id] = location
+                    updates.setdefault(title, []).append(
+                        {'range': f'A{row_number}:H{row_number}', 'values': [row]}
+                    )
+                    self.record_summary_change(summary_changes, title, old_row, row)
+                    continue
+                # The transaction's date now falls in another shard, so move the row
+                moved_rows.append(location)
+                self.record_summary_change(summary_changes, title, old_row, None)
+                
+            target_title = self.shard_period(date)[0]
+            self.record_summary_change(summary_changes, target_title, None, row)
+            shard_rows, shard_ids = appends.setdefault(target_title, ([], []))
+            shard_rows.append(row)
+            shard_ids.append(transaction_id)
+            appended_ids.add(transaction_id)
+            
+        for title, shard_updates in updates.items():
+            self.get_shard_worksheet(title).batch_update(shard_updates)
+            
+        for title, (shard_rows, shard_ids) in appends.items():
+            response = self.get_shard_worksheet(title).append_rows(shard_rows)
+            first_row = first_appended_row(response)
+            if first_row is None:
+                # Fall back to re-reading the shard's ID column
+                self.load_row_index(title)
+                continue
+            for offset, transaction_id in enumerate(shard_ids):
+                self.row_index[transaction_id] = (title, first_row + offset)
+                
+        if moved_rows:
+            self.delete_rows(moved_rows)
+            
+        # Archived shards that changed need their summaries adjusted
+        for title, (removed_rows, added_rows) in summary_changes.items():
+            self.adjust_shard_summary(title, removed_rows, added_rows)
+            
+        added = len(appended_ids) - len(moved_rows)
+        updated = sum(len(shard_updates) for shard_updates in updates.values()) + len(moved_rows)
+        return added, updated
+    
+    def record_summary_change(self, summary_changes, title, old_row, new_row):
+        """Note a row change in an archived shard so its summary can be adjusted"""
+        if self.shards[title]['status'] != 'archived':
             return
+        removed_rows, added_rows = summary_changes.setdefault(title, ([], []))
+        if old_row is not None:
+            removed_rows.append(old_row)
+        if new_row is not None:
+            added_rows.append(new_row)
+    
+    def delete_rows(self, locations):
+        """Delete (shard title, row number) rows in one batch request and shift the row index"""
+        deleted = {}
+        for title, row_number in set(locations):
+            deleted.setdefault(title, []).append(row_number)
+            
+        # Delete bottom-up within each shard so earlier deletions don't shift later ones
+        requests = []
+        for title, row_numbers in deleted.items():
+            row_numbers.sort()
+            sheet_id = self.get_shard_worksheet(title).id
+            requests.extend({
+                'deleteDimension': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'dimension': 'ROWS',
+                        'startIndex': row_number - 1,
+                        'endIndex': row_number
+                    }
+                }
+            } for row_number in reversed(row_numbers))
+        self.sheet.batch_update({'requests': requests})
+        
+        # Shift the remaining rows up by the number of deleted rows above them
+        for transaction_id, (title, row_number) in self.row_index.items():
+            if title in deleted:
+                shift = bisect.bisect_left(deleted[title], row_number)
+                self.row_index[transaction_id] = (title, row_number - shift)
+        return deleted
+    
+    def add_transactions_to_sheet(self, transactions, refresh_index=True):
+        """Add new transactions to Google Sheets, reconciling pending rows in place"""
+        added, updated = self.write_transactions(transactions, refresh_index)
+        print(f"Added {added} new transactions to the sheet ({updated} rows updated in place)")
+        return added
+    
+    def remove_transactions_from_sheet(self, transaction_ids, refresh_index=True):
+        """Delete the rows of removed transactions in a single batch request"""
+        transaction_ids = set(transaction_ids)
+        if refresh_index:
+            self.reset_row_index()
+        
+        # Removed transactions are recent, so only the active shards and the
+        # pending lookback window are searched; IDs not found there (such as a
+        # pending transaction whose row was already taken over) are skipped
+        today = datetime.now().date()
+        self.index_shards(today - timedelta(days=PENDING_LOOKBACK_DAYS), today)
+        for title, shard in self.shards.items():
+            if shard['status'] == 'active' and title not in self.indexed_shards:
+                self.load_row_index(title)
+        
+        locations = []
+        summary_changes = {}
+        for transaction_id in transaction_ids:
+            old_row = self.row_values.pop(transaction_id, None)
+            if transaction_id not in self.row_index:
+                continue
+            location = self.row_index.pop(transaction_id)
+            locations.append(location)
+            self.record_summary_change(summary_changes, location[0], old_row, None)
+        self.pending_ids.difference_update(transaction_ids)
+        if not locations:
+            return 0
+            
+        self.delete_rows(locations)
+        for title, (removed_rows, added_rows) in summary_changes.items():
+            self.adjust_shard_summary(title, removed_rows, added_rows)
+            
+        print(f"Removed {len(locations)} transactions from the sheet")
+        return len(locations)
+    
+    def pending_ids_between(self, start_date, end_date):
+        """Return the IDs of indexed pending rows dated within a range"""
+        pending_ids = []
+        for transaction_id in self.pending_ids:
+            try:
+                date = parse_date(str(self.row_values[transaction_id][0]))
+            except (KeyError, ValueError):
+                continue
+            if start_date <= date <= end_date:
+                pending_ids.append(transaction_id)
+        return pending_ids
+    
+    def run_update_cycle(self, days_back=30):
+        """Fetch recent transactions, sync them into the sheet and refresh the dashboard"""
+        if not hasattr(self, 'transactions_worksheet'):
+            self.create_financial_spreadsheet()
+        else:
+            self.roll_over_shards()
             
-        # Convert to pandas DataFrame for analysis
-        df = pd.DataFrame(transactions_data, columns=[
-            "Date", "Description", "Amount", "Category", 
-            "Account", "Transaction ID", "Pending", "Merchant Name"
-        ])
+        today = datetime.now().date()
+        start_date = today - timedelta(days=days_back)
+        transactions = self.get_transactions(start_date)
+        # Re-read row positions for the whole window, even if Plaid returned
+        # nothing for part of it
+        self.reset_row_index()
+        self.index_shards(start_date, today)
+        added = self.add_transactions_to_sheet(transactions, refresh_index=False)
         
-        # Convert amount to float
-        df['Amount'] = df['Amount'].astype(float)
+        # Pending rows in the window that Plaid no longer returns were cancelled,
+        # or posted without a pending_transaction_id linking them
+        fetched_ids = {transaction.transaction_id for transaction in transactions}
+        vanished_ids = [
+            transaction_id for transaction_id in self.pending_ids_between(start_date, today)
+            if transaction_id not in fetched_ids
+        ]
+        if vanished_ids:
+            self.remove_transactions_from_sheet(vanished_ids, refresh_index=False)
+        self.update_dashboard()
         
-        # Convert date to datetime
-        df['Date'] = pd.to_datetime(df['Date'])
+        # Keep normalized merchant names for the next run
+        self.merchant_normalizer.save()
+        stats = self.merchant_normalizer.stats()
+        print(f"Merchant cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate, {stats['size']} entries)")
+        self.merchant_normalizer.reset_stats()
+        return added
+    
+    def load_spending_summary(self, start_date=None, end_date=None):
+        """Get monthly per-category spending and income for a date range"""
+        return read_spending_summary(
+            self.shards,
+            lambda title: self.get_shard_worksheet(title).get_all_values()[1:],  # Skip header
+            self.shard_summary_rows,
+            start_date,
+            end_date
+        )
+    
+    def update_dashboard(self, start_date=None, end_date=None):
+        """Update the dashboard with spending charts and summaries"""
+        # Get monthly per-category totals from the shards covering the range
+        spending = self.load_spending_summary(start_date, end_date)
+        
+        if spending.empty:
+            print("No transactions to analyze")
+            return
+            
+        # Net amount per month and category
+        spending = spending.assign(Amount=spending['Income'] - spending['Spending'])
         
         # Calculate spending by category
-        category_spending = df.groupby('Category')['Amount'].sum().sort_values(ascending=False)
+        category_spending = spending.groupby('Category')['Amount'].sum().sort_values(ascending=False)
         
         # Calculate monthly spending
-        df['Month'] = df['Date'].dt.strftime('%Y-%m')
-        monthly_spending = df.groupby('Month')['Amount'].sum()
+        monthly_spending = spending.groupby('Month')['Amount'].sum()
         
         # Clear existing dashboard
         self.dashboard_worksheet.clear()
@@ -292,7 +1141,7 @@ class FinancialTracker:
         self.dashboard_worksheet.format('A1', {'textFormat': {'bold': True, 'fontSize': 14}})
         
         # Total spending
-        total_spending = df['Amount'].sum()
+        total_spending = spending['Amount'].sum()
         self.dashboard_worksheet.update('A3', 'Total Spending:')
         self.dashboard_worksheet.update('B3', f"${abs(total_spending):.2f}")
         
@@ -314,36 +1163,28 @@ class FinancialTracker:
             self.dashboard_worksheet.update(f'B{i}', f"${abs(amount):.2f}")
             
         # Add charts
-        self.add_charts_to_dashboard()
+        self.add_charts_to_dashboard(spending)
             
         print("Dashboard updated successfully")
     
-    def add_charts_to_dashboard(self):
+    def add_charts_to_dashboard(self, spending=None):
         """Add charts to the dashboard worksheet"""
-        # Get transaction data
-        transactions_data = self.transactions_worksheet.get_all_values()[1:]  # Skip header
+        # Get monthly per-category totals
+        if spending is None:
+            spending = self.load_spending_summary()
         
-        if not transactions_data:
+        if spending.empty:
             print("No transactions to visualize")
             return
         
-        # Convert to pandas DataFrame for analysis
-        df = pd.DataFrame(transactions_data, columns=[
-            "Date", "Description", "Amount", "Category", 
-            "Account", "Transaction ID", "Pending", "Merchant Name"
-        ])
-        
-        # Convert amount to float
-        df['Amount'] = df['Amount'].astype(float).abs()  # Use absolute values for spending
+        # Use absolute values for spending
+        spending = spending.assign(Amount=spending['Spending'] + spending['Income'])
         
         # Prepare data for charts
-        categories = df.groupby('Category')['Amount'].sum().reset_index()
+        categories = spending.groupby('Category')['Amount'].sum().reset_index()
         categories = categories.sort_values('Amount', ascending=False)
         
-        # Convert date to datetime
-        df['Date'] = pd.to_datetime(df['Date'])
-        df['Month'] = df['Date'].dt.strftime('%Y-%m')
-        monthly = df.groupby('Month')['Amount'].sum().reset_index()
+        monthly = spending.groupby('Month')['Amount'].sum().reset_index()
         
     # Create pie chart for category spending
         try:
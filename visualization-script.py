@@ -1,8 +1,9 @@
 import gspread
-import pandas as pd
+from datetime import datetime
 from google.oauth2.service_account import Credentials
+from financial_tracker import read_shard_manifest, read_spending_summary, summary_title
 
-def create_dashboard(creds_path, sheet_id):
+def create_dashboard(creds_path, sheet_id, start_date=None, end_date=None):
     """Create a dashboard with data for charts based on transaction data"""
     # Set up credentials
     scope = ['https://spreadsheets.google.com/feeds',
@@ -20,25 +21,35 @@ def create_dashboard(creds_path, sheet_id):
     
     # Get transaction data
     try:
-        transactions_ws = sheet.worksheet("Transactions")
-        transactions_data = transactions_ws.get_all_values()
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(transactions_data[1:], columns=transactions_data[0])
-        
-        # Convert Amount to numeric
-        df['Amount'] = pd.to_numeric(df['Amount'])
+        # Transactions are sharded across the worksheets listed in the Shards manifest;
+        # read only the shards the date range needs, using summaries for archived ones
+        try:
+            shards = read_shard_manifest(sheet.worksheet("Shards"))
+        except gspread.exceptions.WorksheetNotFound:
+            shards = {"Transactions": {'start': datetime.min.date(), 'end': datetime.max.date(), 'status': 'active'}}
+            
+        summary = read_spending_summary(
+            shards,
+            lambda title: sheet.worksheet(title).get_all_values()[1:],
+            lambda title: sheet.worksheet(summary_title(title)).get_all_values()[1:],
+            start_date,
+            end_date
+        )
         
         # Calculate metrics
-        total_spending = df[df['Amount'] < 0]['Amount'].sum() * -1
-        total_income = df[df['Amount'] > 0]['Amount'].sum()
+        total_spending = summary['Spending'].sum()
+        total_income = summary['Income'].sum()
         net_cash_flow = total_income - total_spending
         
         # Prepare data for category summary
-        category_spending = df[df['Amount'] < 0].groupby('Category')['Amount'].sum() * -1
-        category_spending = category_spending.reset_index()
+        category_spending = summary.groupby('Category')['Spending'].sum()
+        category_spending = category_spending[category_spending > 0].rename('Amount').reset_index()
         category_spending = category_spending.sort_values('Amount', ascending=False)
         
+        # Calculate monthly spending for time trend chart
+        monthly_spending = summary.groupby('Month')['Spending'].sum()
+        monthly_spending = monthly_spending[monthly_spending > 0].rename('Amount').reset_index()
+        
         # Create Dashboard worksheet or clear existing one
         try:
             try:
@@ -87,12 +98,6 @@ def create_dashboard(creds_path, sheet_id):
             if pie_data:
                 dashboard_ws.update(f'D6', pie_data)
             
-            # Calculate monthly spending for time trend chart
-            df['Date'] = pd.to_datetime(df['Date'])
-            df['Month'] = df['Date'].dt.strftime('%Y-%m')
-            monthly_spending = df[df['Amount'] < 0].groupby('Month')['Amount'].sum() * -1
-            monthly_spending = monthly_spending.reset_index()
-            
             # Add monthly data for bar/line chart
             row_offset = len(pie_data) + 8
             dashboard_ws.update(f'D{row_offset}', [['Monthly Spending Data (For Bar/Line Chart)']])